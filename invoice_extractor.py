@@ -7,17 +7,24 @@ and maintains an Excel tracking sheet.
 """
 
 import argparse
+import concurrent.futures
+import errno
+import logging
+import os
 import re
 import shutil
 import sys
-from datetime import datetime
+from collections import Counter
+from datetime import date, datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
-import pdfplumber
+import fitz
 from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill
 from openpyxl.utils import get_column_letter
+from openpyxl.workbook.defined_name import DefinedName
 from openpyxl.worksheet.datavalidation import DataValidation
 
 
@@ -25,6 +32,7 @@ from openpyxl.worksheet.datavalidation import DataValidation
 NEW_FOLDER = Path("./new")
 ARCHIVE_FOLDER = Path("./archive")
 EXCEL_FILE = Path("./tax_records.xlsx")
+INDEX_FILE = Path("./tax_records.index")  # Filenames already in EXCEL_FILE
 LOG_FILE = Path("./extraction_log.txt")
 
 # German expense categories
@@ -41,9 +49,34 @@ EXPENSE_CATEGORIES = [
     "Sonstiges"
 ]
 
+# Tracking sheet, plus hidden sheet and defined name holding the category
+# list for validation
+INVOICES_SHEET = "Invoices"
+CATEGORIES_SHEET = "_Categories"
+CATEGORY_LIST_NAME = "CategoryList"
+
+# German VAT rates (standard, reduced)
+GERMAN_VAT_RATES = (19, 7)
+
+# Excel tracking sheet columns
+EXCEL_HEADERS = [
+    "Filename", "Date", "Vendor", "Invoice_Number", "Net",
+    "VAT_Rate", "VAT_Amount", "Gross", "Category",
+    "Extraction_Status", "Notes"
+]
+
+# Extraction status values, in report order
+EXTRACTION_STATUSES = ('OK', 'UNCERTAIN', 'MANUAL_REVIEW_NEEDED')
+
+# Column numbers (1-based) that get special formatting
+DATE_COL = 2  # B
+CURRENCY_COLS = (5, 7, 8)  # E, G, H - Net, VAT_Amount, Gross
+STATUS_COL = 10  # J
+
 # Color definitions
 YELLOW_FILL = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
 RED_FILL = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+STATUS_FILLS = {'UNCERTAIN': YELLOW_FILL, 'MANUAL_REVIEW_NEEDED': RED_FILL}
 
 # Regex patterns for German invoices
 PATTERNS = {
@@ -66,14 +99,50 @@ PATTERNS = {
     'company_suffix': re.compile(r'\b(GmbH|AG|UG|KG|OHG|e\.V\.)\b'),
 }
 
+# Keywords for gross total (most important)
+GROSS_KEYWORDS = [
+    'SUMME EUR', 'BRUTTO', 'Gesamtbetrag', 'Total EUR', 'Gesamt',
+    'TOTAL', 'Rechnungsbetrag', 'Endbetrag', 'Betrag gesamt',
+    'Gesamtsumme', 'Rechnungssumme'
+]
+
+# Keywords for net amount
+NET_KEYWORDS = [
+    'NETTO', 'Nettobetrag', 'Summe Netto', 'NETTO-WARENWERT',
+    'Zwischensumme', 'Warenwert', 'Netto-Betrag', 'Nettopreis'
+]
+
+# Keywords for VAT amount
+VAT_KEYWORDS = [
+    'MWST', 'MwSt', 'Mehrwertsteuer', 'USt', 'Umsatzsteuer',
+    'MwSt.-Betrag', 'Steuer', 'VAT'
+]
+
+# Uppercase keywords that must occur in the text for the invoice number and
+# VAT rate patterns to match, so the regex search can be skipped otherwise
+INVOICE_NUMBER_KEYWORDS = ('RECHNUNG', 'INVOICE')
+VAT_RATE_KEYWORDS = ('MWST', 'MEHRWERTSTEUER', 'UST', 'UMSATZSTEUER')
+
+# Sender prefixes in front of vendor names
+PREFIX_RE = re.compile(r'^(?:Von:|From:|Lieferant:|Aussteller:)\s*', re.IGNORECASE)
+
+# Vendor folder name cleanup
+NONWORD_RE = re.compile(r'[^\w\s-]')
+WSDASH_RE = re.compile(r'[\s-]+')
+
+# Log file handler stays open for the whole run (file created on first message)
+LOG_LEVELS = {"INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR}
+_log_handler = logging.FileHandler(LOG_FILE, encoding="utf-8", delay=True)
+_log_handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s: %(message)s", "%Y-%m-%d %H:%M:%S"))
+_LOGGER = logging.getLogger("invoice_extractor")
+_LOGGER.setLevel(logging.INFO)
+_LOGGER.propagate = False
+_LOGGER.addHandler(_log_handler)
+
 
 def log_message(message: str, level: str = "INFO"):
     """Log message to file with timestamp."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] {level}: {message}\n"
-
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(log_entry)
+    _LOGGER.log(LOG_LEVELS.get(level, logging.INFO), message)
 
     if level == "ERROR":
         print(f"❌ {message}")
@@ -108,8 +177,8 @@ def sanitize_vendor_name(vendor_name: str) -> str:
     vendor_name = vendor_name.lower()
 
     # Replace spaces and special characters with underscores
-    vendor_name = re.sub(r'[^\w\s-]', '', vendor_name)
-    vendor_name = re.sub(r'[\s-]+', '_', vendor_name)
+    vendor_name = NONWORD_RE.sub('', vendor_name)
+    vendor_name = WSDASH_RE.sub('_', vendor_name)
 
     return vendor_name.strip('_')
 
@@ -149,18 +218,28 @@ def parse_german_date(date_str: str) -> Optional[str]:
     if not date_str:
         return None
 
+    parts = date_str.split('.')
+    if len(parts) != 3:
+        return None
+
+    day, month, year = parts
+    if not (0 < len(day) <= 2 and 0 < len(month) <= 2 and len(year) in (2, 4)):
+        return None
+
     try:
-        # Try DD.MM.YYYY
-        if len(date_str.split('.')[-1]) == 4:
-            dt = datetime.strptime(date_str, "%d.%m.%Y")
-        else:
-            # Try DD.MM.YY
-            dt = datetime.strptime(date_str, "%d.%m.%y")
+        day, month, year_num = int(day), int(month), int(year)
 
-        return dt.strftime("%d.%m.%Y")
+        # DD.MM.YY uses the same pivot as strptime's %y (69-99 -> 19xx)
+        if len(year) == 2:
+            year_num += 2000 if year_num < 69 else 1900
+
+        # Validates day/month ranges
+        datetime(year_num, month, day)
     except ValueError:
         return None
 
+    return f"{day:02d}.{month:02d}.{year_num:04d}"
+
 
 def extract_vendor_name(text: str) -> Optional[str]:
     """
@@ -175,7 +254,7 @@ def extract_vendor_name(text: str) -> Optional[str]:
             # Clean up the line
             line = line.strip()
             # Remove common prefixes
-            line = re.sub(r'^(Von:|From:|Lieferant:|Aussteller:)\s*', '', line, flags=re.IGNORECASE)
+            line = PREFIX_RE.sub('', line)
 
             if len(line) > 3 and len(line) < 100:
                 return line
@@ -193,12 +272,15 @@ def extract_vendor_name(text: str) -> Optional[str]:
     return None
 
 
-def extract_amount_near_keyword(text: str, keywords: List[str], context_window: int = 100) -> Optional[float]:
+def extract_amount_near_keyword(text: str, keywords: List[str], context_window: int = 100,
+                                text_upper: Optional[str] = None) -> Optional[float]:
     """
     Extract currency amount near specific keywords.
     Looks for the first currency amount within context_window characters after keyword.
+    Pass text_upper when searching the same text repeatedly.
     """
-    text_upper = text.upper()
+    if text_upper is None:
+        text_upper = text.upper()
 
     for keyword in keywords:
         keyword_upper = keyword.upper()
@@ -218,36 +300,177 @@ def extract_amount_near_keyword(text: str, keywords: List[str], context_window:
     return None
 
 
-def extract_amounts_with_context(text: str) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+def extract_amounts_with_context(text: str, text_upper: Optional[str] = None) -> Tuple[Optional[float], Optional[float], Optional[float]]:
     """
     Extract Net, VAT, and Gross amounts using keyword-based context search.
     Returns: (net, vat_amount, gross)
     """
-    # Keywords for gross total (most important)
-    gross_keywords = [
-        'SUMME EUR', 'BRUTTO', 'Gesamtbetrag', 'Total EUR', 'Gesamt',
-        'TOTAL', 'Rechnungsbetrag', 'Endbetrag', 'Betrag gesamt',
-        'Gesamtsumme', 'Rechnungssumme'
-    ]
+    # Extract each amount type (uppercase the text only once)
+    if text_upper is None:
+        text_upper = text.upper()
+    gross = extract_amount_near_keyword(text, GROSS_KEYWORDS, context_window=150, text_upper=text_upper)
+    net = extract_amount_near_keyword(text, NET_KEYWORDS, context_window=150, text_upper=text_upper)
+    vat_amount = extract_amount_near_keyword(text, VAT_KEYWORDS, context_window=150, text_upper=text_upper)
 
-    # Keywords for net amount
-    net_keywords = [
-        'NETTO', 'Nettobetrag', 'Summe Netto', 'NETTO-WARENWERT',
-        'Zwischensumme', 'Warenwert', 'Netto-Betrag', 'Nettopreis'
-    ]
+    return net, vat_amount, gross
 
-    # Keywords for VAT amount
-    vat_keywords = [
-        'MWST', 'MwSt', 'Mehrwertsteuer', 'USt', 'Umsatzsteuer',
-        'MwSt.-Betrag', 'Steuer', 'VAT'
-    ]
 
-    # Extract each amount type
-    gross = extract_amount_near_keyword(text, gross_keywords, context_window=150)
-    net = extract_amount_near_keyword(text, net_keywords, context_window=150)
-    vat_amount = extract_amount_near_keyword(text, vat_keywords, context_window=150)
+def match_net_amount(amounts: List[float], gross: float, vat_rates: Tuple[int, ...]) -> Optional[Tuple[float, int]]:
+    """
+    Find the amount that equals gross minus VAT at one of the given rates
+    (tolerance: €0.02). Rates are tried in order.
+    Returns: (net, vat_rate) or None
+    """
+    for rate in vat_rates:
+        expected_net = gross / (1 + rate / 100)
+        closest = min(amounts, key=lambda amount: abs(amount - expected_net))
+        if abs(closest - expected_net) <= 0.02:
+            return closest, rate
 
-    return net, vat_amount, gross
+    return None
+
+
+def extract_fields_from_text(text: str, data: Dict) -> bool:
+    """
+    Fill data with the fields extracted from invoice text.
+    Returns True if every field was found in the text itself (nothing
+    assumed or calculated) and the amounts validate, so there is no need
+    to read further pages.
+    """
+    # Extract vendor name
+    vendor = extract_vendor_name(text)
+    if vendor:
+        data['vendor'] = vendor
+    else:
+        data['vendor'] = 'Unknown Vendor'
+        data['extraction_status'] = 'UNCERTAIN'
+        data['notes'] += 'Vendor name unclear; '
+
+    # Uppercased once for the keyword checks and the amount search
+    text_upper = text.upper()
+
+    # Extract invoice number (skip the regex if no keyword is present)
+    inv_match = None
+    if any(keyword in text_upper for keyword in INVOICE_NUMBER_KEYWORDS):
+        inv_match = PATTERNS['invoice_number'].search(text)
+
+    if inv_match:
+        data['invoice_number'] = inv_match.group(1).strip()
+    else:
+        data['extraction_status'] = 'UNCERTAIN'
+        data['notes'] += 'Invoice number not found; '
+
+    # Extract date (first valid date)
+    for date_match in PATTERNS['date'].finditer(text):
+        parsed_date = parse_german_date(date_match.group(1))
+        if parsed_date:
+            data['date'] = parsed_date
+            break
+
+    if not data['date']:
+        data['extraction_status'] = 'UNCERTAIN'
+        data['notes'] += 'Date not found; '
+
+    # Extract VAT rate (skip the regex if no keyword is present)
+    vat_rate_match = None
+    if any(keyword in text_upper for keyword in VAT_RATE_KEYWORDS):
+        vat_rate_match = PATTERNS['vat_rate'].search(text)
+
+    vat_rate_assumed = not vat_rate_match
+    if vat_rate_match:
+        data['vat_rate'] = f"{vat_rate_match.group(1)}%"
+    else:
+        # Default to 19% for Germany (noted below unless the amounts
+        # reveal the rate)
+        data['vat_rate'] = '19%'
+
+    # Extract amounts using keyword-based context search (PRIORITY METHOD)
+    # This prevents extraction of line item prices instead of totals
+    net, vat_amount, gross = extract_amounts_with_context(text, text_upper)
+
+    data['net'] = net
+    data['vat_amount'] = vat_amount
+    data['gross'] = gross
+
+    # If keyword-based extraction failed, try fallback method
+    if not gross:
+        # Fallback: collect all amounts and use largest as gross
+        amounts = []
+        for match in PATTERNS['currency'].finditer(text):
+            amount = parse_german_currency(match.group(1))
+            if amount and amount > 0:
+                amounts.append(amount)
+
+        if amounts:
+            data['gross'] = max(amounts)
+            data['extraction_status'] = 'UNCERTAIN'
+            data['notes'] += 'Gross extracted without keyword context; '
+
+            # Look for the net amount among the candidates, trying the
+            # standard and reduced rate unless the VAT rate was found
+            if not data['net']:
+                vat_rates = (int(vat_rate_match.group(1)),) if vat_rate_match else GERMAN_VAT_RATES
+                matched = match_net_amount(amounts, data['gross'], vat_rates)
+                if matched:
+                    data['net'], rate = matched
+                    if vat_rate_assumed:
+                        data['vat_rate'] = f"{rate}%"
+                        vat_rate_assumed = False
+                    data['notes'] += f'Net matched among amounts at {rate}% VAT; '
+
+    if vat_rate_assumed:
+        data['notes'] += 'VAT rate assumed 19%; '
+
+    # Try to calculate missing values if we have gross
+    if data['gross'] and (not data['net'] or not data['vat_amount']):
+        vat_rate_num = 19  # default
+        if data['vat_rate']:
+            vat_rate_num = int(data['vat_rate'].replace('%', ''))
+
+        if not data['net']:
+            # Calculate net from gross and VAT rate
+            data['net'] = data['gross'] / (1 + vat_rate_num / 100)
+            data['extraction_status'] = 'UNCERTAIN'
+            data['notes'] += 'Net calculated from gross; '
+
+        if not data['vat_amount']:
+            # Calculate VAT amount
+            data['vat_amount'] = data['gross'] - data['net']
+
+    # Validate amounts: Net + VAT ≈ Gross (tolerance: €0.02)
+    if data['net'] and data['vat_amount'] and data['gross']:
+        calculated_gross = data['net'] + data['vat_amount']
+        if abs(calculated_gross - data['gross']) > 0.02:
+            # Validation failed - log all values for manual review
+            data['extraction_status'] = 'UNCERTAIN'
+            data['notes'] += f'Validation failed (Net:{data["net"]:.2f} + VAT:{data["vat_amount"]:.2f} ≠ Gross:{data["gross"]:.2f}); '
+    else:
+        # Missing critical amount data
+        if not data['gross']:
+            data['extraction_status'] = 'MANUAL_REVIEW_NEEDED'
+            data['notes'] += 'Gross amount not found; '
+        else:
+            # We have gross but calculated net/vat - mark as uncertain
+            if data['extraction_status'] == 'OK':
+                data['extraction_status'] = 'UNCERTAIN'
+
+    found_all = bool(vendor and inv_match and data['date'] and vat_rate_match and net and vat_amount and gross)
+    return found_all and data['extraction_status'] == 'OK'
+
+
+def may_be_complete(text: str) -> bool:
+    """
+    Cheap precheck for extract_fields_from_text: True if invoice number,
+    date and VAT rate patterns match and a gross keyword is present, which
+    a complete extraction requires.
+    """
+    text_upper = text.upper()
+    return bool(
+        any(keyword.upper() in text_upper for keyword in GROSS_KEYWORDS)
+        and PATTERNS['invoice_number'].search(text)
+        and PATTERNS['date'].search(text)
+        and PATTERNS['vat_rate'].search(text)
+    )
 
 
 def extract_invoice_data(pdf_path: Path) -> Dict:
@@ -270,111 +493,32 @@ def extract_invoice_data(pdf_path: Path) -> Dict:
     }
 
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            # Extract text from first few pages
+        with fitz.open(pdf_path) as doc:
+            # Read the first few pages one at a time, stopping early once the
+            # text so far yields a complete extraction
             text = ""
-            for page in pdf.pages[:3]:  # Check first 3 pages
-                text += page.extract_text() or ""
+            result = None
+            last_page = min(3, doc.page_count) - 1  # Check first 3 pages
+            for i in range(last_page + 1):
+                text += doc.load_page(i).get_text("text")
+                if not text.strip():
+                    continue
+
+                # Only run the full extraction before the last page when the
+                # text could be complete
+                if i < last_page and not may_be_complete(text):
+                    continue
+
+                result = dict(data)
+                if extract_fields_from_text(text, result):
+                    break
 
-            if not text.strip():
+            if result is None:
                 data['extraction_status'] = 'MANUAL_REVIEW_NEEDED'
                 data['notes'] = 'No text extracted from PDF'
                 return data
 
-            # Extract vendor name
-            vendor = extract_vendor_name(text)
-            if vendor:
-                data['vendor'] = vendor
-            else:
-                data['vendor'] = 'Unknown Vendor'
-                data['extraction_status'] = 'UNCERTAIN'
-                data['notes'] += 'Vendor name unclear; '
-
-            # Extract invoice number
-            inv_match = PATTERNS['invoice_number'].search(text)
-            if inv_match:
-                data['invoice_number'] = inv_match.group(1).strip()
-            else:
-                data['extraction_status'] = 'UNCERTAIN'
-                data['notes'] += 'Invoice number not found; '
-
-            # Extract date (look for recent dates)
-            dates = PATTERNS['date'].findall(text)
-            for date_str in dates:
-                parsed_date = parse_german_date(date_str)
-                if parsed_date:
-                    data['date'] = parsed_date
-                    break
-
-            if not data['date']:
-                data['extraction_status'] = 'UNCERTAIN'
-                data['notes'] += 'Date not found; '
-
-            # Extract VAT rate
-            vat_rate_match = PATTERNS['vat_rate'].search(text)
-            if vat_rate_match:
-                data['vat_rate'] = f"{vat_rate_match.group(1)}%"
-            else:
-                # Default to 19% for Germany
-                data['vat_rate'] = '19%'
-                data['notes'] += 'VAT rate assumed 19%; '
-
-            # Extract amounts using keyword-based context search (PRIORITY METHOD)
-            # This prevents extraction of line item prices instead of totals
-            net, vat_amount, gross = extract_amounts_with_context(text)
-
-            data['net'] = net
-            data['vat_amount'] = vat_amount
-            data['gross'] = gross
-
-            # If keyword-based extraction failed, try fallback method
-            if not gross:
-                # Fallback: collect all amounts and use largest as gross
-                amounts = []
-                for match in PATTERNS['currency'].finditer(text):
-                    amount = parse_german_currency(match.group(1))
-                    if amount and amount > 0:
-                        amounts.append(amount)
-
-                amounts = sorted(set(amounts))
-
-                if amounts:
-                    data['gross'] = amounts[-1]
-                    data['extraction_status'] = 'UNCERTAIN'
-                    data['notes'] += 'Gross extracted without keyword context; '
-
-            # Try to calculate missing values if we have gross
-            if data['gross'] and (not data['net'] or not data['vat_amount']):
-                vat_rate_num = 19  # default
-                if data['vat_rate']:
-                    vat_rate_num = int(data['vat_rate'].replace('%', ''))
-
-                if not data['net']:
-                    # Calculate net from gross and VAT rate
-                    data['net'] = data['gross'] / (1 + vat_rate_num / 100)
-                    data['extraction_status'] = 'UNCERTAIN'
-                    data['notes'] += 'Net calculated from gross; '
-
-                if not data['vat_amount']:
-                    # Calculate VAT amount
-                    data['vat_amount'] = data['gross'] - data['net']
-
-            # Validate amounts: Net + VAT ≈ Gross (tolerance: €0.02)
-            if data['net'] and data['vat_amount'] and data['gross']:
-                calculated_gross = data['net'] + data['vat_amount']
-                if abs(calculated_gross - data['gross']) > 0.02:
-                    # Validation failed - log all values for manual review
-                    data['extraction_status'] = 'UNCERTAIN'
-                    data['notes'] += f'Validation failed (Net:{data["net"]:.2f} + VAT:{data["vat_amount"]:.2f} ≠ Gross:{data["gross"]:.2f}); '
-            else:
-                # Missing critical amount data
-                if not data['gross']:
-                    data['extraction_status'] = 'MANUAL_REVIEW_NEEDED'
-                    data['notes'] += 'Gross amount not found; '
-                else:
-                    # We have gross but calculated net/vat - mark as uncertain
-                    if data['extraction_status'] == 'OK':
-                        data['extraction_status'] = 'UNCERTAIN'
+            data = result
 
     except Exception as e:
         data['extraction_status'] = 'MANUAL_REVIEW_NEEDED'
@@ -383,27 +527,13 @@ def extract_invoice_data(pdf_path: Path) -> Dict:
     return data
 
 
-def setup_excel_file():
-    """Create Excel file with proper structure if it doesn't exist."""
-    if EXCEL_FILE.exists():
-        return
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Invoices"
-
-    # Headers
-    headers = [
-        "Filename", "Date", "Vendor", "Invoice_Number", "Net",
-        "VAT_Rate", "VAT_Amount", "Gross", "Category",
-        "Extraction_Status", "Notes"
-    ]
-    ws.append(headers)
-
-    # Format header row
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(1, col_num)
-        cell.font = Font(bold=True)
+def create_tracking_workbook():
+    """
+    Create a write-only workbook with the tracking sheet structure.
+    Returns (workbook, worksheet) with the header row already written.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(INVOICES_SHEET)
 
     # Set column widths
     column_widths = {
@@ -423,42 +553,123 @@ def setup_excel_file():
     for col, width in column_widths.items():
         ws.column_dimensions[col].width = width
 
+    add_category_list(wb, ws)
+
+    # Headers (bold)
+    header_cells = []
+    for header in EXCEL_HEADERS:
+        cell = WriteOnlyCell(ws, header)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    return wb, ws
+
+
+def add_category_list(wb, ws):
+    """
+    Put the category list on a hidden sheet, referenced by a workbook-level
+    name, and validate the whole Category column against it.
+    """
+    categories_ws = wb.create_sheet(CATEGORIES_SHEET)
+    categories_ws.sheet_state = 'hidden'
+    for category in EXPENSE_CATEGORIES:
+        categories_ws.append([category])
+
+    wb.defined_names[CATEGORY_LIST_NAME] = DefinedName(
+        CATEGORY_LIST_NAME,
+        attr_text=f"'{CATEGORIES_SHEET}'!$A$1:$A${len(EXPENSE_CATEGORIES)}"
+    )
+
     # Add data validation for Category column
-    dv = DataValidation(type="list", formula1=f'"{",".join(EXPENSE_CATEGORIES)}"', allow_blank=True)
-    ws.add_data_validation(dv)
-    dv.add(f'I2:I1000')  # Apply to first 1000 rows
+    dv = DataValidation(type="list", formula1=CATEGORY_LIST_NAME, allow_blank=True)
+    dv.add('I2:I1048576')  # Apply to the whole column below the header
+    ws.data_validations.append(dv)
+
+
+def upgrade_category_list(wb, ws):
+    """
+    Upgrade trackers created with the inline category list (I2:I1000)
+    to the hidden sheet and named range.
+    """
+    if CATEGORIES_SHEET in wb.sheetnames:
+        return
 
-    wb.save(EXCEL_FILE)
+    # Drop the old inline list validation on the Category column
+    ws.data_validations.dataValidation = [
+        dv for dv in ws.data_validations.dataValidation
+        if not (dv.type == "list" and 'I2' in dv.sqref)
+    ]
+
+    add_category_list(wb, ws)
+    log_message(f"Moved the category list of {EXCEL_FILE} to the {CATEGORIES_SHEET} sheet")
+
+
+def save_workbook(wb):
+    """Save workbook to a temporary file and atomically rename it over EXCEL_FILE."""
+    tmp_file = EXCEL_FILE.with_name(EXCEL_FILE.name + ".tmp")
+    try:
+        wb.save(tmp_file)
+        os.replace(tmp_file, EXCEL_FILE)
+    finally:
+        # Only left behind if saving or renaming failed
+        if tmp_file.exists():
+            tmp_file.unlink()
+
+
+def setup_excel_file():
+    """Create Excel file with proper structure if it doesn't exist."""
+    if EXCEL_FILE.exists():
+        return
+
+    wb, _ = create_tracking_workbook()
+    save_workbook(wb)
     log_message(f"Created Excel file: {EXCEL_FILE}")
 
+    # An index left over from a previous Excel file is stale
+    if INDEX_FILE.exists():
+        INDEX_FILE.unlink()
 
-def get_existing_filenames() -> set:
-    """Get set of filenames already processed in Excel."""
-    if not EXCEL_FILE.exists():
-        return set()
 
-    wb = load_workbook(EXCEL_FILE)
-    ws = wb.active
+def get_existing_filenames() -> set:
+    """
+    Get set of filenames already processed.
+    Reads the sidecar index; builds it from the Excel file if missing.
+    """
+    if INDEX_FILE.exists():
+        return set(INDEX_FILE.read_text(encoding="utf-8").splitlines())
 
     filenames = set()
-    for row in ws.iter_rows(min_row=2, max_col=1, values_only=True):
-        if row[0]:
-            filenames.add(row[0])
+    if EXCEL_FILE.exists():
+        wb = load_workbook(EXCEL_FILE, read_only=True, data_only=True)
+        try:
+            for row in tracker_sheet(wb).iter_rows(min_row=2, max_col=1, values_only=True):
+                if row[0]:
+                    filenames.add(str(row[0]))
+        finally:
+            wb.close()
 
-    wb.close()
+    add_to_index(sorted(filenames))
     return filenames
 
 
-def append_to_excel(data: Dict):
-    """Append invoice data to Excel file."""
-    wb = load_workbook(EXCEL_FILE)
-    ws = wb.active
+def add_to_index(filenames: List[str]):
+    """Append filenames to the sidecar index of processed invoices."""
+    with open(INDEX_FILE, "a", encoding="utf-8") as f:
+        for filename in filenames:
+            f.write(filename + "\n")
+
 
-    # Find next empty row
-    next_row = ws.max_row + 1
+def tracker_sheet(wb):
+    """Return the Invoices sheet (the active sheet for files without one)."""
+    if INVOICES_SHEET in wb.sheetnames:
+        return wb[INVOICES_SHEET]
+    return wb.active
 
-    # Append data
-    row_data = [
+
+def invoice_to_row(data: Dict) -> List:
+    """Convert extracted invoice data to a row of Excel values."""
+    return [
         data['filename'],
         data['date'],
         data['vendor'],
@@ -472,35 +683,47 @@ def append_to_excel(data: Dict):
         data['notes'].strip()
     ]
 
-    ws.append(row_data)
 
-    # Format currency columns (E, G, H - Net, VAT_Amount, Gross)
-    for col in ['E', 'G', 'H']:
-        cell = ws[f'{col}{next_row}']
-        if cell.value:
-            cell.number_format = '#,##0.00 €'
+def append_row(ws, row_data: List):
+    """Append a row to the worksheet with formatting and color coding."""
+    # Color coding based on extraction status (OK rows stay unfilled)
+    fill = STATUS_FILLS.get(row_data[STATUS_COL - 1])
+
+    cells = []
+    for col_num, value in enumerate(row_data, 1):
+        number_format = None
+        if value:
+            if col_num in CURRENCY_COLS:
+                number_format = '#,##0.00 €'
+            elif col_num == DATE_COL:
+                number_format = 'DD.MM.YYYY'
 
-    # Format date column (B)
-    cell = ws[f'B{next_row}']
-    if cell.value:
-        cell.number_format = 'DD.MM.YYYY'
+        # Unstyled values are appended as-is, without a cell object
+        if fill is None and number_format is None:
+            cells.append(value)
+            continue
 
-    # Apply color coding based on extraction status
-    if data['extraction_status'] == 'UNCERTAIN':
-        for col in range(1, 12):
-            ws.cell(next_row, col).fill = YELLOW_FILL
-    elif data['extraction_status'] == 'MANUAL_REVIEW_NEEDED':
-        for col in range(1, 12):
-            ws.cell(next_row, col).fill = RED_FILL
+        cell = WriteOnlyCell(ws, value)
+        if number_format:
+            cell.number_format = number_format
+        if fill:
+            cell.fill = fill
+        cells.append(cell)
 
-    wb.save(EXCEL_FILE)
+    ws.append(cells)
 
 
-def move_to_archive(pdf_path: Path, vendor_name: str):
-    """Move PDF to vendor-specific archive folder."""
+def move_to_archive(pdf_path: Path, vendor_name: str, vendor_folders: Optional[Set[Path]] = None):
+    """
+    Move PDF to vendor-specific archive folder.
+    vendor_folders caches folders already created during a batch.
+    """
     sanitized_vendor = sanitize_vendor_name(vendor_name)
     vendor_folder = ARCHIVE_FOLDER / sanitized_vendor
-    vendor_folder.mkdir(parents=True, exist_ok=True)
+    if vendor_folders is None or vendor_folder not in vendor_folders:
+        vendor_folder.mkdir(parents=True, exist_ok=True)
+        if vendor_folders is not None:
+            vendor_folders.add(vendor_folder)
 
     destination = vendor_folder / pdf_path.name
 
@@ -513,10 +736,92 @@ def move_to_archive(pdf_path: Path, vendor_name: str):
             destination = vendor_folder / f"{base_name}_{counter}{suffix}"
             counter += 1
 
-    shutil.move(str(pdf_path), str(destination))
+    try:
+        # Single rename on the same filesystem
+        os.replace(pdf_path, destination)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # Different filesystem: copy and delete
+        shutil.move(str(pdf_path), str(destination))
+
     return destination
 
 
+def process_batch(pdf_files: List[Path]) -> Tuple[int, int]:
+    """
+    Extract, record and archive a batch of new PDFs.
+    PDFs are only archived once the Excel file with their rows is saved.
+    Returns: (processed_count, error_count)
+    """
+    processed_count = 0
+    error_count = 0
+    appended_filenames = []
+    pending_moves = []  # (pdf_path, vendor) of rows waiting for the save
+    vendor_folders = set()
+
+    # Append to the loaded tracker. Rebuilding it in write-only mode would
+    # keep only cell values and drop comments, styles, column widths, freeze
+    # panes and filters the user added.
+    wb = load_workbook(EXCEL_FILE)
+    ws = tracker_sheet(wb)
+    upgrade_category_list(wb, ws)
+
+    # Extraction is CPU-bound, so fan it out across processes. Excel updates
+    # stay on the main process (workbook state is not shareable).
+    workers = min(os.cpu_count() or 1, len(pdf_files))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(extract_invoice_data, pdf_files, chunksize=4)
+
+        for pdf_path, data in zip(pdf_files, results):
+            print(f"Processing: {pdf_path.name}")
+
+            try:
+                # Append to Excel
+                append_row(ws, invoice_to_row(data))
+                appended_filenames.append(data['filename'])
+            except Exception as e:
+                error_msg = f"Failed to process {pdf_path.name}: {str(e)}"
+                log_message(error_msg, "ERROR")
+                error_count += 1
+                print()
+                continue
+
+            pending_moves.append((pdf_path, data['vendor']))
+
+            # Log results
+            status_icon = "✓" if data['extraction_status'] == 'OK' else "⚠️" if data['extraction_status'] == 'UNCERTAIN' else "❌"
+            print(f"  {status_icon} Vendor: {data['vendor']}")
+            print(f"  {status_icon} Gross: {data['gross']:.2f} € " if data['gross'] else "  ⚠️  Gross: N/A")
+            print(f"  {status_icon} Status: {data['extraction_status']}\n")
+
+    # Save once for the whole batch. If that fails (e.g. the file is open in
+    # Excel), nothing is archived and the PDFs stay in new/ for the next run.
+    try:
+        save_workbook(wb)
+    except Exception as e:
+        log_message(f"Failed to save {EXCEL_FILE}: {str(e)} (PDFs left in {NEW_FOLDER})", "ERROR")
+        return processed_count, error_count + len(pending_moves)
+
+    add_to_index(appended_filenames)
+
+    # Move to archive now that the rows are saved
+    for pdf_path, vendor in pending_moves:
+        try:
+            archive_path = move_to_archive(pdf_path, vendor, vendor_folders)
+            log_message(f"Processed {pdf_path.name} -> {archive_path}")
+            processed_count += 1
+        except Exception as e:
+            error_msg = f"Failed to archive {pdf_path.name}: {str(e)}"
+            log_message(error_msg, "ERROR")
+            error_count += 1
+
+    if pending_moves:
+        print()
+
+    return processed_count, error_count
+
+
 def process_invoices():
     """Main processing function: extract data from PDFs and update Excel."""
     # Ensure folders exist
@@ -542,6 +847,7 @@ def process_invoices():
     skipped_count = 0
     error_count = 0
 
+    todo = []
     for pdf_path in pdf_files:
         # Check if already processed
         if pdf_path.name in existing_filenames:
@@ -549,33 +855,10 @@ def process_invoices():
             skipped_count += 1
             continue
 
-        print(f"Processing: {pdf_path.name}")
-
-        try:
-            # Extract data
-            data = extract_invoice_data(pdf_path)
-
-            # Append to Excel
-            append_to_excel(data)
-
-            # Move to archive
-            archive_path = move_to_archive(pdf_path, data['vendor'])
-
-            # Log results
-            status_icon = "✓" if data['extraction_status'] == 'OK' else "⚠️" if data['extraction_status'] == 'UNCERTAIN' else "❌"
-            print(f"  {status_icon} Vendor: {data['vendor']}")
-            print(f"  {status_icon} Gross: {data['gross']:.2f} € " if data['gross'] else "  ⚠️  Gross: N/A")
-            print(f"  {status_icon} Status: {data['extraction_status']}")
-            print(f"  ✓ Archived to: {archive_path.parent.name}/{archive_path.name}\n")
+        todo.append(pdf_path)
 
-            log_message(f"Processed {pdf_path.name} -> {archive_path}")
-            processed_count += 1
-
-        except Exception as e:
-            error_msg = f"Failed to process {pdf_path.name}: {str(e)}"
-            log_message(error_msg, "ERROR")
-            error_count += 1
-            print()
+    if todo:
+        processed_count, error_count = process_batch(todo)
 
     # Summary
     print("=" * 50)
@@ -593,51 +876,44 @@ def show_report():
         print("No Excel file found. Process some invoices first.")
         return
 
-    wb = load_workbook(EXCEL_FILE)
-    ws = wb.active
-
     # Collect statistics
     total_invoices = 0
-    vendor_counts = {}
-    month_counts = {}
+    vendor_counts = Counter()
+    month_counts = Counter()
     total_gross = 0
-    status_counts = {'OK': 0, 'UNCERTAIN': 0, 'MANUAL_REVIEW_NEEDED': 0}
-
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        if not row[0]:  # Skip empty rows
-            continue
-
-        total_invoices += 1
-
-        # Vendor statistics
-        vendor = row[2] or 'Unknown'
-        vendor_counts[vendor] = vendor_counts.get(vendor, 0) + 1
+    status_counts = Counter()
 
-        # Month statistics
-        if row[1]:  # Date
-            try:
-                if isinstance(row[1], str):
-                    date_obj = datetime.strptime(row[1], "%d.%m.%Y")
-                else:
-                    date_obj = row[1]
-                month_key = date_obj.strftime("%Y-%m")
-                month_counts[month_key] = month_counts.get(month_key, 0) + 1
-            except:
-                pass
-
-        # Gross total
-        if row[7]:  # Gross amount
-            try:
-                total_gross += float(row[7])
-            except:
-                pass
-
-        # Status counts
-        status = row[9] or 'OK'
-        if status in status_counts:
-            status_counts[status] += 1
-
-    wb.close()
+    wb = load_workbook(EXCEL_FILE, read_only=True, data_only=True)
+    try:
+        ws = tracker_sheet(wb)
+        for row in ws.iter_rows(min_row=2, max_col=len(EXCEL_HEADERS), values_only=True):
+            if not row[0]:  # Skip empty rows
+                continue
+
+            total_invoices += 1
+
+            # Vendor statistics
+            vendor_counts[row[2] or 'Unknown'] += 1
+
+            # Month statistics
+            date_obj = row[1]  # Date
+            if isinstance(date_obj, str):
+                try:
+                    day, month, year = map(int, date_obj.split('.'))
+                    date_obj = datetime(year, month, day)
+                except ValueError:
+                    date_obj = None
+            if isinstance(date_obj, date):
+                month_counts[date_obj.strftime("%Y-%m")] += 1
+
+            # Gross total
+            if isinstance(row[7], (int, float)):  # Gross amount
+                total_gross += row[7]
+
+            # Status counts
+            status_counts[row[9] or 'OK'] += 1
+    finally:
+        wb.close()
 
     # Display report
     print("\n" + "=" * 50)
@@ -648,13 +924,13 @@ def show_report():
     print(f"Total Gross Amount: {total_gross:,.2f} €")
 
     print(f"\nExtraction Status:")
-    for status, count in status_counts.items():
+    for status in EXTRACTION_STATUSES:
+        count = status_counts[status]
         if count > 0:
             print(f"  {status}: {count}")
 
     print(f"\nTop Vendors:")
-    sorted_vendors = sorted(vendor_counts.items(), key=lambda x: x[1], reverse=True)
-    for vendor, count in sorted_vendors[:10]:
+    for vendor, count in vendor_counts.most_common(10):
         print(f"  {vendor}: {count} invoice(s)")
 
     print(f"\nInvoices by Month:")